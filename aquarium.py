@@ -1,674 +1,300 @@
 #!/usr/bin/env python3
 
-import math
+import argparse
 import random
-from abc import ABC, abstractmethod
 import time
-from typing import Type
 
+from rich.color import Color as RichColor
 from rich.segment import Segment
 from rich.style import Style
 from textual import events
 from textual.app import App, ComposeResult
-from textual.color import Color
 from textual.geometry import Offset
 from textual.reactive import var
 from textual.strip import Strip
 from textual.widget import Widget
 
-from auto_restart import restart_on_changes
-
-tank_width = 80
-tank_height = 24
-
-# Class hierarchy for entities
-class Entity(ABC):
-
-    instances: list['Entity'] = []
-    """All instances of this class. This is available on each subclass."""
-    solid_instances: list['Entity'] = []
-    """All instances of this class that are solid. This is available on each subclass."""
-
-    def __init__(self, x: int, y: int, symbol: str, color: Color = Color(255, 255, 255), bgcolor: Color | None = None, solid: bool = False):
-        self.x = x
-        self.y = y
-        self.symbol = symbol
-        self.symbol_width = 0 # calculated when rendering
-        self.color = color
-        self.bgcolor = bgcolor
-        self.solid = solid
-        self.add_to_lists()
-
-    def add_to_lists(self):
-        for cls in self.__class__.mro():
-            if issubclass(cls, Entity):
-                cls.instances.append(self)
-                if self.solid:
-                    cls.solid_instances.append(self)
-                if cls is Entity:
-                    break
-
-    def remove_from_lists(self):
-        for cls in self.__class__.mro():
-            if issubclass(cls, Entity):
-                if self in cls.instances:
-                    cls.instances.remove(self)
-                if self in cls.solid_instances:
-                    cls.solid_instances.remove(self)
-                if cls is Entity:
-                    break
-
-    def __init_subclass__(cls, **kwargs):
-        super().__init_subclass__(**kwargs)
-        cls.instances = []
-        cls.solid_instances = []
-
-    @abstractmethod
-    def move(self):
-        pass
-
-    def collision_at(self, offset: Offset) -> bool:
-        entities = [e for e in Entity.solid_instances if e is not self]
-        if offset.y >= tank_height:
-            return True
-        if entity_at(offset, entities) is not None:
-            return True
-        if self.symbol_width > 1 and entity_at(offset + Offset(1, 0), entities) is not None:
-            return True
-        # Assuming there's no character wider than 2 cells
-        return False
-
-class Sinker(Entity):
-    def move(self):
-        if not self.collision_at(Offset(self.x, self.y + 1)):
-            self.y += 1
-        # In case tank shrinks, move up if we're out of bounds
-        if self.y > tank_height - 1:
-            self.y = tank_height - 1
-        # If we're inside the ground, move up
-        if self.collision_at(Offset(self.x, self.y)):
-            self.y -= 1
-
-class BottomDweller(Sinker):
-    # def __init__(self, x, y, symbol, color=Color(255, 255, 255), bgcolor=None):
-    #     super().__init__(x, y, symbol, color, bgcolor)
-    def __init__(self, x, y, symbol = None):
-        if symbol is None:
-            symbol = random.choice('🦞🐌🦐🦀')
-        super().__init__(x, y, symbol)
-        self.direction = random.choice([-1, 1])
-
-    def move(self):
-        super().move()
-        # If we're on the ground, move left or right
-        if self.collision_at(Offset(self.x, self.y + 1)) and random.random() < 0.3:
-            if self.collision_at(Offset(self.x + self.direction, self.y)):
-                if not self.collision_at(Offset(self.x + self.direction, self.y - 1)):
-                    self.x += self.direction
-                    self.y -= 1
-                else:
-                    self.direction *= -1
-            else:
-                self.x += self.direction
-            # Randomly change direction occasionally
-            if random.random() < 0.05:
-                self.direction *= -1
-
-class Ink(Entity):
-    def __init__(self, x, y, color, opacity=1.0):
-        super().__init__(x, y, '▓', color)
-        self.opaque_color = color
-        self.opacity = opacity
-
-    def move(self):
-        self.color = self.opaque_color.with_alpha(self.opacity)
-        self.opacity -= 0.01
-        if self.opacity <= 0:
-            self.remove_from_lists()
-        # Spread out
-        if self.opacity > 0.3:
-            for offset in [Offset(0, 1), Offset(0, -1), Offset(1, 0), Offset(-1, 0)]:
-                spread_pos = Offset(self.x, self.y) + offset
-                # if entity_at(spread_pos, Ink.instances) is None:
-                if entity_at(spread_pos, Entity.instances) is None:
-                    Ink(spread_pos.x, spread_pos.y, self.opaque_color, self.opacity - 0.3)
-
-class Cephalopod(BottomDweller):
-    def __init__(self, x, y):
-        symbol = random.choice('🦑🐙')
-        super().__init__(x, y, symbol)
-        self.ink_color = Color.parse("rgb(0, 0, 0)") if symbol == '🐙' else Color.parse("rgb(0, 0, 100)")
-        self.ink_timer = 0
-        self.hunting = None
-        self.scared = False
-
-    def move(self):
-        super().move()
-        # Look for predators
-        def distance(entity: Entity) -> float:
-            return math.sqrt((entity.x - self.x) ** 2 + (entity.y - self.y) ** 2)
-        nearby = sorted(Entity.instances, key=distance)
-        nearby = [entity for entity in nearby if distance(entity) < 5]
-        if random.random() < 0.1:
-            for entity in nearby:
-                if self.is_predator(entity):
-                    self.ink()
-                    self.scared = True
-                    # Run away
-                    self.hunting = None
-                    if entity.x < self.x:
-                        self.direction = 1
-                    elif entity.x > self.x:
-                        self.direction = -1
-                    break
-        # Look for prey
-        if random.random() < 0.1:
-            for entity in nearby:
-                if self.is_prey(entity):
-                    self.hunting = entity
-                    break
-        # Move towards prey
-        if self.hunting is not None:
-            if self.hunting.x < self.x:
-                self.direction = -1
-            elif self.hunting.x > self.x:
-                self.direction = 1
-            else:
-                self.direction = random.choice([-1, 1])
-            if self.collision_at(Offset(self.x + self.direction, self.y)):
-                self.hunting = None
-            else:
-                self.x += self.direction
-        # Eat prey
-        if self.hunting is not None and self.hunting.x == self.x and self.hunting.y == self.y:
-            self.hunting.remove_from_lists()
-            self.hunting = None
-
-    def is_predator(self, entity: Entity) -> bool:
-        if entity == self:
-            return False
-        if isinstance(entity, Cephalopod):
-            return True
-        if entity.symbol in "🦈🐊🐉🐲🐳🐋🐙🦑🐧🦭🦦":
-            return True
-        return False
-
-    def is_prey(self, entity: Entity) -> bool:
-        if entity == self:
-            return False
-        return entity.symbol in "🐟🐠🦐🦀🦞🐙🦑🦪🐌🪼🍤🍣"
-
-    def ink(self):
-        Ink(self.x, self.y, self.ink_color)
-
-class Fish(Entity):
-    def __init__(self, x, y):
-        super().__init__(x, y, random.choice(['🐡', '🐠', '🐠', '🐟', '🐟', '🐟']))
-        self.direction = random.choice([-1, 1])
-        self.bubble_timer = 0
-
-    def move(self):
-        if self.collision_at(Offset(self.x + self.direction, self.y)):
-            self.direction *= -1
-        else:
-            self.x += self.direction
-
-        # Randomly change direction occasionally
-        if random.random() < 0.05:
-            self.direction *= -1
-
-        # Create bubbles occasionally
-        if self.bubble_timer <= 0 and random.random() < 0.1:
-            Bubble(self.x, self.y - 1)
-            self.bubble_timer = 5
-        else:
-            self.bubble_timer -= 1
-
-        # Wrap around the screen
-        if self.x < 0:
-            self.x = tank_width
-        elif self.x > tank_width:
-            self.x = 0
-
-class Ground(Entity):
-    def __init__(self, x, y):
-        symbol = random.choice('       ࿔𖡎.܈܉܇⋰∵⸪∴⸫˙\'⠁⠂⠄⠆⠈⠊⠌⠐⠑⠒⠔⠕⠘⠠⠡⠢⠪⡀⡁⡠⡡⡢⢀⢂')
-        color = random.choice([
-            Color.parse("rgb(91, 62, 31)"),
-            Color.parse("rgb(139, 69, 19)"),
-            Color.parse("rgb(160, 82, 45)"),
-            Color.parse("rgb(205, 133, 63)"),
-            Color.parse("rgb(222, 184, 135)"),
-        ])
-        bgcolor = random.choice([
-            Color.parse("rgb(102, 67, 29)"),
-            Color.parse("rgb(129, 60, 10)"),
-            Color.parse("rgb(127, 79, 45)"),
-            Color.parse("rgb(151, 70, 33)"),
-            Color.parse("rgb(175, 107, 40)"),
-        ])
-        super().__init__(x, y, symbol, color, bgcolor, solid=True)
-
-    def move(self):
-        if not self.collision_at(Offset(self.x, self.y + 1)):
-            self.y += 1
-        # In case tank shrinks, ground will be regenerated.
-
-class SeaUrchin(Sinker):
-    def __init__(self, x, y):
-        symbol = random.choice(['✶', '✷', '✸', '✹', '✺', '*', '⚹', '✳', '꘎', '💥']) # '🗯', '🦔'
-        color = random.choice([
-            Color.parse("rgb(255, 132, 0)"),
-            Color.parse("rgb(136, 61, 194)"),
-            Color.parse("rgb(255, 0, 0)"),
-            Color.parse("rgb(255, 255, 255)"),
-        ])
-        super().__init__(x, y, symbol, color, solid=True)
-
-class Coral(Sinker):
-    def __init__(self, x, y):
-        symbol = random.choice('🪸🧠') # 🫚🫁
-        color = random.choice([
-            Color.parse("rgb(255, 179, 0)"),
-            Color.parse("rgb(255, 213, 0)"),
-            Color.parse("rgb(255, 210, 254)"),
-            Color.parse("rgb(255, 255, 255)"),
-        ])
-        super().__init__(x, y, symbol, color, solid=True)
-
-class Shell(Sinker):
-    def __init__(self, x, y):
-        symbol = random.choice('🦪🐚𖡎') # 🥟
-        super().__init__(x, y, symbol, solid=True)
-
-class Rock(Sinker):
-    def __init__(self, x, y):
-        # rock emoji width is unreliable (it takes up one space in VS Code, but two in Ubuntu Terminal)
-        # symbol = random.choice('🪨🪨🪨🪨🗿')
-        symbol = random.choice('⬬⬟⭓⬢⬣☗☁⬤🗿')
-        super().__init__(x, y, symbol, Color.parse("rgb(128, 128, 128)"), solid=True)
-
-class Seaweed(Sinker):
-    def __init__(self, x, y, seaweed_below=None):
-        super().__init__(x, y, '🌿')
-        self.seaweed_below = seaweed_below
-        self.seaweed_above = None
-
-    def move(self):
-        # Apply gravity to bottom-most seaweed
-        if self.seaweed_below is None:
-            super().move()
-
-        # Wiggle back and forth, within 1 space of the seaweed below and above
-        if self.seaweed_below is not None:
-            new_x = self.x + random.randint(-1, 1)
-            # constrain to the range of the seaweed above
-            if self.seaweed_above is not None:
-                new_x = max(new_x, self.seaweed_above.x - 1)
-                new_x = min(new_x, self.seaweed_above.x + 1)
-            # constrain to the range of the seaweed below
-            # Do this after so it takes precedence, since the bottom seaweed has gravity.
-            new_x = max(new_x, self.seaweed_below.x - 1)
-            new_x = min(new_x, self.seaweed_below.x + 1)
-            # Constrain x so it doesn't move too much at once
-            new_x = max(new_x, self.x - 1)
-            new_x = min(new_x, self.x + 1)
-            # Move horizontally
-            self.x = new_x
-            # Constrain y
-            new_y = self.seaweed_below.y - 1
-            new_y = min(new_y, self.y + 1)
-            new_y = max(new_y, self.y - 1)
-            self.y = new_y
-
-        # Create new seaweed above if there is room
-        growth_rate = 0.01
-        if self.y > 0 and random.random() < growth_rate and self.seaweed_above is None:
-            self.seaweed_above = Seaweed(self.x, self.y - 1, self)
-
-class Bubble(Entity):
-    def __init__(self, x, y):
-        # 🫧 width is unreliable (looks wrong in Ubuntu terminal)
-        symbol = random.choice(['･', '◦', '∘', 'ߋ', '𝚘', 'ᴑ', 'o', 'O', 'ₒ', '°', '˚', 'ᴼ', ':', 'ஃ', '🝆', 'ꖜ', 'ꕣ', 'ꕢ']) # , *['🫧'] * 10
-        super().__init__(x, y, symbol, Color.parse("rgb(157, 229, 255)"))
-
-    def move(self):
-        self.y -= 1
-
-        # Move sideways occasionally
-        if random.random() < 0.1:
-            self.x += random.choice([-1, 1])
-
-        # Remove the bubble if it reaches the top of the tank
-        if self.y < 0:
-            self.remove_from_lists()
-
-class HumanBodyPart(Entity):
-    def __init__(self, x: int, y: int, symbol: str, human: 'Human'):
-        super().__init__(x, y, symbol, Color.parse("rgb(255, 255, 0)"), solid=False)
-        self.human = human
-    def move(self):
-        pass
-class HumanHead(HumanBodyPart):
-    pass
-class HumanTorso(HumanBodyPart):
-    pass
-class HumanLeftArm(HumanBodyPart):
-    pass
-class HumanRightArm(HumanBodyPart):
-    pass
-class HumanLeftLeg(HumanBodyPart):
-    pass
-class HumanRightLeg(HumanBodyPart):
-    pass
-
-class Human(Entity):
-    """
-    Human divers use several symbols in a template, with entities for each body part.
-
-    Some of these examples vary from the template, and include extra parts for gear or legs.
-      🤿
-    🫷🧥🫸
-      👖
-     🩴🩴
-
-     ➿🏒
-    /👙\
-     /\
-
-      |
-    🧯🥽
-    💪🩱🫳
-    🦵 🦶
-
-       |
-      ꝏ    ∞ ಹ  ⛽🛢️
-    👋🎽🖖
-      🩳
-      🧦
-    """
-    def __init__(self, x: int, y: int):
-        super().__init__(x, y, '', Color.parse("rgb(255, 255, 0)"))
-        self.direction = random.choice([-1, 0, 1])
-        self.vertical_direction = random.choice([-1, 0, 1])
-        self.vertical_move_timer = 0
-        self.bubble_timer = 0
-        self.attention: Entity | None = None
-        self.seen: set[Entity] = set()
-        TEMPLATE: list[list[Type[HumanBodyPart] | None]] = [
-            [None, None, HumanHead, None, None],
-            [HumanLeftArm, None, HumanTorso, None, HumanRightArm],
-            [None, HumanLeftLeg, None, HumanRightLeg, None],
-        ]
-        self.parts: dict[Offset, HumanBodyPart] = {}
-        for row in range(len(TEMPLATE)):
-            for col in range(len(TEMPLATE[row])):
-                cls = TEMPLATE[row][col]
-                if cls is not None:
-                    if cls is HumanHead:
-                        part_symbol = random.choice('🤿🥽➿ꝏ∞ಹ😎')
-                    elif cls is HumanTorso:
-                        part_symbol = random.choice('🧥🩱👙🎽')
-                    elif cls is HumanLeftArm:
-                        part_symbol = random.choice('🫷💪🖖👋')
-                    elif cls is HumanRightArm:
-                        part_symbol = random.choice('🫸🫳🖖👋')
-                    # elif cls is HumanLeftLeg or cls is HumanRightLeg:
-                    #     part_symbol = "🩴"
-                    elif cls is HumanLeftLeg:
-                        part_symbol = random.choice('🦵')
-                    elif cls is HumanRightLeg:
-                        part_symbol = random.choice('🦶')
-                    else:
-                        raise Exception(f"Unknown class for human body part: {cls}")
-
-                    offset = Offset(col - 2, row)
-                    part = cls(self.x + offset.x, self.y + offset.y, part_symbol, self)
-                    self.parts[offset] = part
-
-    def collision_at(self, human_offset: Offset) -> bool:
-        for part_offset, part in self.parts.items():
-            if part.collision_at(human_offset + part_offset):
-                return True
-        return False
-
-    def move(self):
-        if self.collision_at(Offset(self.x + self.direction, self.y)):
-            self.direction *= -1
-        else:
-            self.x += self.direction
-        if self.vertical_direction != 0:
-            self.vertical_move_timer -= 1
-            if self.vertical_move_timer <= 0:
-                self.vertical_move_timer = 10
-                if self.collision_at(Offset(self.x, self.y + self.vertical_direction)):
-                    self.vertical_direction = 0
-                else:
-                    self.y += self.vertical_direction
-
-        # Randomly change direction occasionally
-        if random.random() < 0.05:
-            self.direction = random.choice([-1, 0, 1])
-        if random.random() < 0.05:
-            self.vertical_direction = random.choice([-1, 0, 1])
-
-        # Create bubbles regularly, in bursts
-        if self.bubble_timer <= 6:
-            Bubble(self.x, self.y - 1)
-        if self.bubble_timer <= 0:
-            self.bubble_timer = 20
-        else:
-            self.bubble_timer -= 1
-
-        # Wrap around the screen
-        if self.x < 0:
-            self.x = tank_width - 1
-        elif self.x > tank_width - 1:
-            self.x = 0
-
-        # Look around
-        if random.random() < 0.05:
-            self.attention = None
-            def distance(entity: Entity) -> float:
-                return math.sqrt((entity.x - self.x) ** 2 + (entity.y - self.y) ** 2)
-            nearby = sorted(Entity.instances, key=distance)
-            nearby = [entity for entity in nearby if distance(entity) < 5]
-            for entity in nearby:
-                if entity not in self.seen and self.finds_interesting(entity):
-                    self.seen.add(entity)
-                    self.attention = entity
-                    self.direction = 0
-                    self.vertical_direction = 0
-                    # Debug: visualize attention (persisting after attention is lost)
-                    # entity.bgcolor = Color.parse("rgb(255, 0, 0)")
-                    break
-
-        # Position body parts
-        self.position_subparts()
-
-        # Get outside ground if spawned inside it or moved into it
-        if self.collision_at(Offset(self.x, self.y)):
-            self.y -= 1
-
-    def finds_interesting(self, entity: Entity) -> bool:
-        if entity == self:
-            return False
-        if isinstance(entity, Human):
-            return False
-        if isinstance(entity, HumanBodyPart):
-            return False
-        if isinstance(entity, Bubble):
-            return False
-        if isinstance(entity, Ink):
-            return False
-        if isinstance(entity, Shell):
-            return False
-        if isinstance(entity, Rock):
-            return False
-        if isinstance(entity, Seaweed):
-            return False
-        if isinstance(entity, Ground):
-            return False
-        # if isinstance(entity, Coral):
-        #     return False
-        return True
-
-    def position_subparts(self):
-        for offset, part in self.parts.items():
-            part.x = self.x + offset.x
-            part.y = self.y + offset.y
-            if isinstance(part, HumanLeftLeg) or isinstance(part, HumanRightLeg):
-                # Move legs to animate swimming
-                if time.time() % 0.5 < 0.25:
-                    part.x += 1 if offset.x > 0 else -1
-            # Animate arms
-            if isinstance(part, HumanLeftArm) or isinstance(part, HumanRightArm):
-                if time.time() % 0.5 < 0.25 and self.vertical_direction != 0:
-                    part.y -= 1
-            phase = 0.1 if self.vertical_direction == 1 else 0.4
-            if isinstance(part, HumanLeftArm) and (self.direction == 1 or self.vertical_direction != 0):
-                part.symbol = "🫷" if (time.time() + phase) % 0.5 < 0.25 else "👋" # 🖐️💪
-            if isinstance(part, HumanRightArm) and (self.direction == -1 or self.vertical_direction != 0):
-                part.symbol = "🫸" if (time.time() + phase) % 0.5 < 0.25 else "🫳" # 🫱
-            # Point at object with attention
-            if isinstance(part, HumanLeftArm) or isinstance(part, HumanRightArm):
-                if self.attention is not None and self.vertical_direction == 0 and self.direction == 0:
-                    part.symbol = "👈" if self.attention.x < part.x - 1 else "👉" if self.attention.x > part.x + 1 else "👇" if self.attention.y >= part.x else "👆"
-                elif part.symbol in "👈👉👇👆":
-                    part.symbol = "🖐️" # don't keep pointing after moving on
-
-class GardenEel(BottomDweller):
-    def __init__(self, x: int, y: int):
-        super().__init__(x, y, 'S') # 🪱𓆙〰️〰𓆓〽𓆑
-
-    def move(self):
-        # If we're on the ground (and not just any solid entity),
-        # "burrow" into it (by staying put and changing symbol)
-        if entity_at(Offset(self.x, self.y + 1), Ground.instances):
-            if random.random() < 0.1:
-                self.symbol = random.choice('()⎛⎞/\\|,')
-        else:
-            self.symbol = 'S'
-            super().move()
-
-
-# Initialize the entities
-def random_pos():
-    return random.randint(0, tank_width), random.randint(0, tank_height)
-for _ in range(5):
-    Fish(*random_pos())
-for _ in range(5):
-    SeaUrchin(*random_pos())
-for _ in range(2):
-    BottomDweller(*random_pos())
-for _ in range(2):
-    Cephalopod(*random_pos())
-for _ in range(5):
-    Coral(*random_pos())
-for _ in range(5):
-    Shell(*random_pos())
-for _ in range(5):
-    Rock(*random_pos())
-for _ in range(10):
-    Seaweed(*random_pos())
-for _ in range(2):
-    Human(*random_pos())
-
-def ground_height(x: int) -> int:
-    return 4 + int(2 * math.sin(x / 10) + 1 * math.sin(x / 5) + 1 * math.sin(x / 2))
-
-def generate_ground():
-    for ground in list(Ground.instances):
-        ground.remove_from_lists()
-    for x in range(tank_width):
-        for y in range(tank_height-ground_height(x), tank_height):
-            Ground(x, y)
-
-generate_ground()
-
-garden_eel_colony_x = random.randint(0, tank_width)
-for _ in range(5):
-    eel_x = garden_eel_colony_x + random.randint(-8, 8)
-    GardenEel(eel_x, tank_height - ground_height(eel_x) - 1)
+from engine import OVERLAY_LAYER, Bubble, Color, Entity, HumanBodyPart, cell_width, entity_at, populate_tank, resize_tank, spawn_budget, step, tick_duration
 
 # Define gradient colors
 light_blue = Color(135, 206, 250)
 dark_blue = Color(25, 25, 112)
 
-def entity_at(offset: Offset, entities: list[Entity]) -> Entity | None:
-    for entity in entities:
-        if entity.x <= offset.x < entity.x + entity.symbol_width and entity.y == offset.y:
-            return entity
-    return None
+def rich_color(color: Color) -> RichColor:
+    return RichColor.from_rgb(color.r, color.g, color.b)
+
+fast_forward_frame_interval = 0.5
+"""Time between progress frames while fast-forwarding, in seconds."""
+
+BLANK_GLYPH = 0
+WIDE_GLYPH_TAIL = -1
+"""Glyph id for cells covered by the right part of a glyph wider than one cell."""
+
+class Framebuffer:
+    """
+    A grid of cells that entities are drawn into, before the frame is turned into strips.
+
+    Each cell holds a glyph id, foreground and background colors, the layer it was drawn on,
+    and the entity drawn there. Glyphs on a higher layer cover those on a lower layer,
+    and within a layer, whatever is drawn last wins.
+    """
+    def __init__(self):
+        self.width = 0
+        self.height = 0
+        self.glyphs: list[str] = [" "]
+        """Symbol for each glyph id."""
+        self.glyph_widths: list[int] = [1]
+        """Width in cells of each glyph id."""
+        self.glyph_ids: dict[str, int] = {" ": BLANK_GLYPH}
+        self.cell_glyphs: list[int] = []
+        self.cell_fgs: list[Color | None] = []
+        self.cell_bgs: list[Color | None] = []
+        self.cell_layers: list[int] = []
+        self.cell_entities: list[Entity | None] = []
+        self.blank_glyphs: list[int] = []
+        self.blank_layers: list[int] = []
+        self.blank_nones: list[None] = []
+        """Blank cells, built once per size, to copy from when clearing."""
+        self.styles: dict[tuple[Color | None, Color | None, Color], Style] = {}
+        """Cache of styles by foreground, background, and row background colors."""
+
+    def glyph_id(self, symbol: str) -> int:
+        """Returns the id for a symbol, measuring its width the first time it's seen."""
+        glyph = self.glyph_ids.get(symbol)
+        if glyph is None:
+            glyph = len(self.glyphs)
+            self.glyphs.append(symbol)
+            self.glyph_widths.append(cell_width(symbol))
+            self.glyph_ids[symbol] = glyph
+        return glyph
+
+    def clear(self, width: int, height: int):
+        """Blanks all cells, reallocating them (and the blank templates they're copied from) if the size has changed."""
+        if width != self.width or height != self.height:
+            size = width * height
+            self.width = width
+            self.height = height
+            self.blank_glyphs = [BLANK_GLYPH] * size
+            self.blank_layers = [-1] * size
+            self.blank_nones = [None] * size
+            self.cell_glyphs = list(self.blank_glyphs)
+            self.cell_fgs = list(self.blank_nones)
+            self.cell_bgs = list(self.blank_nones)
+            self.cell_layers = list(self.blank_layers)
+            self.cell_entities = list(self.blank_nones)
+            self.styles.clear()
+        else:
+            self.cell_glyphs[:] = self.blank_glyphs
+            self.cell_fgs[:] = self.blank_nones
+            self.cell_bgs[:] = self.blank_nones
+            self.cell_layers[:] = self.blank_layers
+            self.cell_entities[:] = self.blank_nones
+
+    def draw(self, x: int, y: int, glyph: int, fg: Color | None, bg: Color | None, layer: int, entity: Entity | None = None):
+        """Draws a glyph, unless it's out of bounds or covered by something on a higher layer."""
+        width = self.glyph_widths[glyph]
+        if width == 0 or y < 0 or y >= self.height or x < 0 or x + width > self.width:
+            return
+        start = y * self.width + x
+        end = start + width
+        cell_layers = self.cell_layers
+        for i in range(start, end):
+            if cell_layers[i] > layer:
+                return
+        cell_glyphs = self.cell_glyphs
+        # Blank out any wide glyphs that would be partly covered,
+        # since half a glyph can't be shown, and leaving it would shift the rest of the row.
+        if cell_glyphs[start] == WIDE_GLYPH_TAIL:
+            head = start - 1
+            while cell_glyphs[head] == WIDE_GLYPH_TAIL:
+                head -= 1
+            for i in range(head, start):
+                self.blank(i)
+        row_end = (y + 1) * self.width
+        tail = end
+        while tail < row_end and cell_glyphs[tail] == WIDE_GLYPH_TAIL:
+            self.blank(tail)
+            tail += 1
+        for i in range(start, end):
+            cell_glyphs[i] = WIDE_GLYPH_TAIL
+            self.cell_fgs[i] = fg
+            self.cell_bgs[i] = bg
+            cell_layers[i] = layer
+            self.cell_entities[i] = entity
+        cell_glyphs[start] = glyph
+
+    def blank(self, i: int):
+        """Resets a cell to how clear() leaves it, so that anything can be drawn there again."""
+        self.cell_glyphs[i] = BLANK_GLYPH
+        self.cell_fgs[i] = None
+        self.cell_bgs[i] = None
+        self.cell_layers[i] = -1
+        self.cell_entities[i] = None
+
+    def draw_entities(self, entities: list[Entity]):
+        for entity in entities:
+            symbol = entity.symbol
+            if not symbol:
+                continue
+            glyph = self.glyph_id(symbol)
+            if entity.height == 1:
+                self.draw(entity.x, entity.y, glyph, entity.color, entity.bgcolor, entity.layer, entity)
+            else:
+                for x, y, cell_symbol in entity.cells():
+                    self.draw(x, y, self.glyph_id(cell_symbol), entity.color, entity.bgcolor, entity.layer, entity)
+
+    def draw_text(self, x: int, y: int, text: str, fg: Color | None, bg: Color | None, layer: int):
+        for char in text:
+            glyph = self.glyph_id(char)
+            self.draw(x, y, glyph, fg, bg, layer)
+            x += self.glyph_widths[glyph]
+
+    def entity_at(self, x: int, y: int) -> Entity | None:
+        """Returns the entity shown at the given cell, if any."""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.cell_entities[y * self.width + x]
+        return None
+
+    def style(self, fg: Color | None, bg: Color | None, row_bg: Color) -> Style:
+        key = (fg, bg, row_bg)
+        style = self.styles.get(key)
+        if style is None:
+            if len(self.styles) > 10000:
+                # Ink fades through many colors, so don't let the cache grow forever.
+                self.styles.clear()
+            # Alpha is supported for foreground colors, but not background colors currently,
+            # used for Ink entities.
+            style = Style(
+                color=rich_color(fg.blend(row_bg, 1 - fg.a)) if fg is not None else None,
+                bgcolor=rich_color(bg if bg is not None else row_bg),
+            )
+            self.styles[key] = style
+        return style
+
+    def strip(self, y: int, row_bg: Color) -> Strip:
+        """Returns a row of the frame, merging runs of cells with the same style into single segments."""
+        segments: list[Segment] = []
+        glyphs = self.glyphs
+        cell_glyphs = self.cell_glyphs
+        cell_fgs = self.cell_fgs
+        cell_bgs = self.cell_bgs
+        run_text: list[str] = []
+        run_fg: Color | None = None
+        run_bg: Color | None = None
+        for i in range(y * self.width, (y + 1) * self.width):
+            glyph = cell_glyphs[i]
+            if glyph == WIDE_GLYPH_TAIL:
+                continue
+            # Foreground color doesn't matter for blank cells, so they can join any run with the same background.
+            fg = cell_fgs[i] if glyph != BLANK_GLYPH else run_fg
+            bg = cell_bgs[i]
+            if run_text and (fg != run_fg or bg != run_bg):
+                segments.append(Segment("".join(run_text), self.style(run_fg, run_bg, row_bg)))
+                run_text = []
+            if not run_text:
+                run_fg = cell_fgs[i] if glyph != BLANK_GLYPH else None
+                run_bg = bg
+            run_text.append(glyphs[glyph])
+        if run_text:
+            segments.append(Segment("".join(run_text), self.style(run_fg, run_bg, row_bg)))
+        return Strip(segments, self.width)
 
 class Tank(Widget):
 
     dragging: var[Entity | None] = var[Entity | None](None)
     drag_offset: var[Offset | None] = var[Offset | None](None)
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.mouse_bubbles: set[Offset] = set()
+        """Positions to spawn bubbles at from dragging the mouse, coalesced until the next tick."""
+        self.fast_forward_ticks = 0
+        """Number of ticks left to run without rendering."""
+        self.fast_forward_total = 0
+        """Number of ticks being fast-forwarded through in total, for showing progress."""
+        self.framebuffer = Framebuffer()
+        self.frame_dirty = True
+        """Whether the framebuffer needs to be redrawn before rendering."""
+        self.render_time = 0.0
+        """Time spent rendering since the last tick, in seconds, counted towards the frame time of the next tick."""
+
+    def dragged_entities(self) -> list[Entity]:
+        """Returns the entities that shouldn't move on their own because they're being dragged."""
+        if self.dragging is None:
+            return []
+        if isinstance(self.dragging, HumanBodyPart):
+            # return [self.dragging.human, *self.dragging.human.parts.values()]
+            return [self.dragging.human]
+        return [self.dragging]
+
     def update(self):
+        if self.fast_forward_ticks > 0:
+            self.update_fast_forward()
+            return
+        # Spawn bubbles from mouse movement, at most one per cell per tick
+        for offset in self.mouse_bubbles:
+            if random.random() < 0.5 and spawn_budget.allows(Bubble):
+                Bubble(offset.x, offset.y)
+        self.mouse_bubbles.clear()
         # Move entities
-        dragging: list[Entity] = []
-        if self.dragging is not None:
-            dragging = [self.dragging]
-            if isinstance(self.dragging, HumanBodyPart):
-                # dragging = [self.dragging.human, *self.dragging.human.parts.values()]
-                dragging = [self.dragging.human]
-        for entity in Entity.instances:
-            if entity not in dragging:
-                entity.move()
+        start_time = time.perf_counter()
+        step(skip=self.dragged_entities())
+        # Rendering happens after this returns, so the frame time is this tick plus the rendering of the previous one.
+        spawn_budget.record_frame_time(time.perf_counter() - start_time + self.render_time)
+        self.render_time = 0.0
         # Update the screen
+        self.frame_dirty = True
         self.refresh()
 
+    def update_fast_forward(self):
+        # Run ticks back-to-back, without animation, until it's time to show a progress frame.
+        # This blocks input in the meantime, so the interval shouldn't be too long.
+        deadline = time.perf_counter() + fast_forward_frame_interval
+        dragging = self.dragged_entities()
+        while self.fast_forward_ticks > 0 and time.perf_counter() < deadline:
+            start_time = time.perf_counter()
+            step(skip=dragging, animate=False)
+            spawn_budget.record_frame_time(time.perf_counter() - start_time)
+            self.fast_forward_ticks -= 1
+        self.render_time = 0.0
+        self.mouse_bubbles.clear()
+        self.frame_dirty = True
+        self.refresh()
+
+    def fast_forward(self, ticks: int):
+        """Runs the given number of ticks as fast as possible, rendering only occasional progress frames."""
+        self.fast_forward_ticks = ticks
+        self.fast_forward_total = ticks
+
     def on_mount(self):
-        self.set_interval(0.1, self.update)
+        self.set_interval(tick_duration, self.update)
 
     def render_line(self, y: int) -> Strip:
         """Render a line of the widget."""
+        start_time = time.perf_counter()
+        if self.frame_dirty or self.framebuffer.width != self.size.width or self.framebuffer.height != self.size.height:
+            self.composite()
         bg_color = light_blue.blend(dark_blue, y / self.size.height)
-        bg_style = Style(bgcolor=bg_color.rich_color)
-        entities_at_y = [entity for entity in Entity.instances if entity.y == y]
-        entities_at_y.sort(key=lambda entity: entity.x)
-        segments = []
-        x = 0
-        for entity in entities_at_y:
-            # Some symbols are wider than 1 cell.
-            # If there are 2-wide entities in every cell, we can only fit half of them on the screen.
-            # When rendering as a strip, if we try to include every entity,
-            # by default, things will get shifted rightwards,
-            # since the next entity will start to the right of the last,
-            # and error will accumulate as we try to fit more entities close together.
-
-            # Hide entities that overlap instead of allowing it to shift things rightwards.
-            if entity.x < x:
-                continue
-
-            # visualize segments by color (kind of unpleasant to look at,
-            # at full simulation speed; maybe slow it down to debug.)
-            # bg_color = light_blue.blend(dark_blue, x / self.size.width)
-            # bg_style = Style(bgcolor=bg_color.rich_color)
-
-            new_x = entity.x
-            segments.append(Segment(" " * (new_x - x), bg_style, None))
-            # Alpha is supported for foreground colors, but not background colors currently,
-            # used for Ink entities.
-            ent_fg = entity.color.blend(bg_color, 1 - entity.color.a).rich_color
-            ent_bg = entity.bgcolor.rich_color if entity.bgcolor is not None else None
-            entity_style = bg_style + Style(color=ent_fg, bgcolor=ent_bg)
-            entity_segment = Segment(entity.symbol, entity_style, None)
-            segments.append(entity_segment)
-            entity.symbol_width = entity_segment.cell_length
-            x = new_x + entity_segment.cell_length
-
-        segments.append(Segment(" " * (self.size.width - x), bg_style, None))
-        return Strip(segments)
+        strip = self.framebuffer.strip(y, bg_color)
+        self.render_time += time.perf_counter() - start_time
+        return strip
+
+    def composite(self):
+        """Draws all entities into the framebuffer."""
+        self.frame_dirty = False
+        self.framebuffer.clear(self.size.width, self.size.height)
+        self.framebuffer.draw_entities(Entity.instances)
+        if self.fast_forward_ticks > 0:
+            progress = 1 - self.fast_forward_ticks / self.fast_forward_total
+            self.framebuffer.draw_text(0, 0, f"⏩ {progress:.0%}", Color(255, 255, 255), Color(0, 0, 0), OVERLAY_LAYER)
 
     def on_mouse_down(self, event: events.MouseDown) -> None:
         self.capture_mouse()
-        self.dragging = entity_at(event.offset, Entity.instances)
+        # Prefer whatever is shown in front
+        self.dragging = self.framebuffer.entity_at(event.offset.x, event.offset.y) or entity_at(event.offset.x, event.offset.y, Entity.instances)
         if self.dragging is not None:
             self.drag_offset = event.offset - Offset(self.dragging.x, self.dragging.y)
-        else:
+        elif spawn_budget.allows(Bubble):
             Bubble(event.offset.x, event.offset.y)
 
     def on_mouse_up(self, event: events.MouseUp) -> None:
@@ -686,31 +312,54 @@ class Tank(Widget):
                 self.dragging.human.x = self.dragging.x
                 self.dragging.human.y = self.dragging.y
                 self.dragging.human.position_subparts()
-        elif random.random() < 0.5:
-            Bubble(event.offset.x, event.offset.y)
+        else:
+            self.mouse_bubbles.add(event.offset)
 
 class EmojiAquariumApp(App):
-    def on_resize(self, event: events.Resize) -> None:
-        global tank_width, tank_height
-
-        # Move everything up/down to keep things anchored relative to the bottom of the tank.
-        # Do this before re-generating the ground, so that the new ground doesn't get offset.
-        for entity in Entity.instances:
-            entity.y += event.size.height - tank_height
-
-        tank_width = event.size.width
-        tank_height = event.size.height
+    BINDINGS = [
+        ("f", "fast_forward", "Fast-forward"),
+    ]
+
+    def __init__(self, fast_forward: float = 0):
+        super().__init__()
+        self.initial_fast_forward = fast_forward
+        """Simulated time to fast-forward through on startup, in seconds."""
+
+    def on_mount(self) -> None:
+        if self.initial_fast_forward > 0:
+            self.query_one(Tank).fast_forward(round(self.initial_fast_forward / tick_duration))
+
+    def action_fast_forward(self, seconds: float = 60) -> None:
+        """Fast-forwards the given amount of simulated time, or stops fast-forwarding if already doing so."""
+        tank = self.query_one(Tank)
+        if tank.fast_forward_ticks > 0:
+            tank.fast_forward(0)
+        else:
+            tank.fast_forward(round(seconds / tick_duration))
 
-        generate_ground()
+    def on_resize(self, event: events.Resize) -> None:
+        resize_tank(event.size.width, event.size.height)
 
     def compose(self) -> ComposeResult:
         yield Tank()
 
-app = EmojiAquariumApp()
+def main():
+    parser = argparse.ArgumentParser(description="A fish tank for your terminal.")
+    parser.add_argument("--watch", action="store_true", help="restart when source files change (for development)")
+    parser.add_argument("--fast-forward", type=float, default=0, metavar="SECONDS", help="age the tank by this much simulated time on startup (press F to fast-forward while running)")
+    args = parser.parse_args()
 
-# Must be before app.run() which blocks until the app exits.
-# Takes the app in order to do some clean up of the app before restarting.
-restart_on_changes(app)
+    populate_tank()
+    app = EmojiAquariumApp(fast_forward=args.fast_forward)
+
+    if args.watch:
+        # Imported lazily since it's only needed for development, and starts a file watcher thread.
+        from auto_restart import restart_on_changes
+        # Must be before app.run() which blocks until the app exits.
+        # Takes the app in order to do some clean up of the app before restarting.
+        restart_on_changes(app)
 
-if __name__ == "__main__":
     app.run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Measures the per-tick cost of fish schooling and movement, for different numbers of fish,
+both on their own and as part of a full step() of the simulation.
+
+The work per fish is constant (each fish looks at about 9 to 17 candidates from the 3x3 grid cells around it,
+however many fish there are), but the time per fish still grows somewhat with the number of fish,
+as the fish and grid outgrow the CPU caches and are visited in spatial order rather than memory order.
+About 10,000 fish fit within a 100 ms tick, without much room for anything else,
+so a few thousand fish is the supported size for the tank at its normal tick rate.
+
+Run with `python benchmarks/schooling.py`
+"""
+
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+repo_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(repo_dir))
+
+import engine
+
+FISH_COUNTS = [100, 1_000, 10_000, 30_000]
+CELLS_PER_FISH = 40
+"""Tank area per fish, so that larger schools get a larger tank instead of a more crowded one."""
+WARMUP_TICKS = 10
+TICKS = 50
+
+def run(fish_count: int):
+    # Keep the tank's aspect ratio similar to a terminal window
+    height = max(24, int((fish_count * CELLS_PER_FISH / 3) ** 0.5))
+    width = max(80, height * 3)
+    engine.resize_tank(width, height)
+    for _ in range(fish_count):
+        engine.Fish(*engine.random_pos())
+
+    # Fish are timed on their own, since the cost of other entities (such as ground) depends on the size of the tank,
+    # and then as part of a full step(), for the whole cost of a tick.
+    def fish_tick():
+        engine.index_solid_cells()
+        engine.Fish.school()
+        for fish in engine.Fish.instances:
+            fish.move()
+
+    timings = []
+    for tick in [fish_tick, engine.step]:
+        for _ in range(WARMUP_TICKS):
+            tick()
+        start = time.perf_counter()
+        for _ in range(TICKS):
+            tick()
+        timings.append((time.perf_counter() - start) / TICKS * 1000)
+    fish_only, full_step = timings
+    print(
+        f"{fish_count:>6} fish in {width}x{height} tank: "
+        f"{fish_only:8.2f} ms per tick (fish only, {fish_only / fish_count * 1000:5.2f} µs per fish), "
+        f"{full_step:8.2f} ms per step()"
+    )
+
+def main():
+    if len(sys.argv) > 1:
+        run(int(sys.argv[1]))
+        return
+    # Run each size in a fresh process, so the tanks don't accumulate entities.
+    for fish_count in FISH_COUNTS:
+        subprocess.run([sys.executable, __file__, str(fish_count)], check=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Measures startup time, up to the first frame, in fresh processes.
+
+Run with `python benchmarks/startup.py`
+"""
+
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+repo_dir = Path(__file__).resolve().parent.parent
+
+# Each script prints timestamps (relative to when it started running) for the stages it reaches.
+HEADLESS_SCRIPT = """
+import time
+start = time.perf_counter()
+import engine
+print("import", time.perf_counter() - start)
+engine.populate_tank()
+print("populate", time.perf_counter() - start)
+engine.step()
+print("first tick", time.perf_counter() - start)
+"""
+
+INTERACTIVE_SCRIPT = """
+import time
+start = time.perf_counter()
+import asyncio
+import aquarium
+import engine
+print("import", time.perf_counter() - start)
+engine.populate_tank()
+print("populate", time.perf_counter() - start)
+
+render_line = aquarium.Tank.render_line
+def timed_render_line(self, y):
+    if y == self.size.height - 1 and not hasattr(aquarium, "first_frame_time"):
+        aquarium.first_frame_time = time.perf_counter() - start
+    return render_line(self, y)
+aquarium.Tank.render_line = timed_render_line
+
+async def run():
+    app = aquarium.EmojiAquariumApp()
+    async with app.run_test(size=(80, 24)) as pilot:
+        while not hasattr(aquarium, "first_frame_time"):
+            await pilot.pause(0.001)
+asyncio.run(run())
+print("first frame", aquarium.first_frame_time)
+"""
+
+def measure(script: str, runs: int) -> dict[str, list[float]]:
+    timings: dict[str, list[float]] = {}
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=repo_dir,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        process_time = time.perf_counter() - start
+        for line in output.splitlines():
+            stage, seconds = line.rsplit(" ", 1)
+            timings.setdefault(stage, []).append(float(seconds))
+        timings.setdefault("whole process", []).append(process_time)
+    return timings
+
+def main():
+    runs = 5
+    for name, script in [("headless", HEADLESS_SCRIPT), ("interactive", INTERACTIVE_SCRIPT)]:
+        print(f"{name} (median of {runs} runs):")
+        for stage, seconds in measure(script, runs).items():
+            print(f"  {stage:>14}: {statistics.median(seconds) * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
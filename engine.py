@@ -0,0 +1,1002 @@
+"""The simulation of the aquarium, independent of the terminal UI.
+
+This module is cheap to import, so it can be used for headless tools and benchmarks.
+The tank is empty until populate_tank() is called.
+"""
+
+import math
+import random
+import time
+import unicodedata
+from abc import ABC, abstractmethod
+from collections.abc import Collection, Iterator
+from typing import NamedTuple
+
+# These are defined here rather than importing them from Textual,
+# because importing Textual takes hundreds of milliseconds.
+
+class Offset(NamedTuple):
+    """A position or displacement in cells. Compatible with Textual's Offset."""
+    x: int = 0
+    y: int = 0
+
+    def __add__(self, other: object) -> 'Offset':
+        if isinstance(other, tuple):
+            return Offset(self.x + other[0], self.y + other[1])
+        return NotImplemented
+
+    def __sub__(self, other: object) -> 'Offset':
+        if isinstance(other, tuple):
+            return Offset(self.x - other[0], self.y - other[1])
+        return NotImplemented
+
+class Color(NamedTuple):
+    """An RGB color with alpha. Compatible with Textual's Color, as far as it's used here."""
+    r: int
+    g: int
+    b: int
+    a: float = 1.0
+
+    def with_alpha(self, alpha: float) -> 'Color':
+        return Color(self.r, self.g, self.b, alpha)
+
+    def blend(self, destination: 'Color', factor: float) -> 'Color':
+        """Returns a color part way between this color and the destination color."""
+        if factor <= 0:
+            return self
+        if factor >= 1:
+            return destination
+        r1, g1, b1, a1 = self
+        r2, g2, b2, a2 = destination
+        return Color(
+            int(r1 + (r2 - r1) * factor),
+            int(g1 + (g2 - g1) * factor),
+            int(b1 + (b2 - b1) * factor),
+            a1 + (a2 - a1) * factor,
+        )
+
+tank_width = 80
+tank_height = 24
+
+tick_duration = 0.1
+"""Simulated time per tick, in seconds."""
+animating = True
+"""Whether to do work that only matters for display, such as animating symbols. Off while fast-forwarding."""
+
+# Traits, as bit flags, so entities can be classified with a single bitwise test
+PREDATOR = 1 << 0
+PREY = 1 << 1
+DECOR = 1 << 2
+SOLID = 1 << 3
+INTERESTING = 1 << 4
+
+# Layers for drawing, from back to front.
+# Effects (bubbles, ink) go behind creatures, so they never hide a creature, or blank out half of a wide one.
+TERRAIN_LAYER = 0
+DECOR_LAYER = 1
+EFFECT_LAYER = 2
+CREATURE_LAYER = 3
+OVERLAY_LAYER = 4
+
+def build_symbol_traits(symbols_by_trait: dict[int, str]) -> dict[str, int]:
+    """Combines lists of symbols having each trait into a lookup of each symbol's traits."""
+    traits: dict[str, int] = {}
+    for trait, symbols in symbols_by_trait.items():
+        for symbol in symbols:
+            traits[symbol] = traits.get(symbol, 0) | trait
+    return traits
+
+symbol_traits = build_symbol_traits({
+    PREDATOR: "🦈🐊🐉🐲🐳🐋🐙🦑🐧🦭🦦",
+    PREY: "🐟🐠🦐🦀🦞🐙🦑🦪🐌🪼🍤🍣",
+})
+"""Traits implied by an entity's symbol, in addition to those of its class."""
+
+solid_cells: dict[tuple[int, int], list['Entity']] = {}
+"""Solid entities by the cells they occupy, for quick collision checks. Rebuilt at the start of each tick."""
+
+cell_widths: dict[str, int] = {}
+"""Cache for cell_width()"""
+
+def cell_width(symbol: str) -> int:
+    """Returns the number of terminal cells a symbol takes up."""
+    width = cell_widths.get(symbol)
+    if width is None:
+        width = 0
+        for char in symbol:
+            # Zero-width joiners, variation selectors and combining marks don't take up space
+            if unicodedata.combining(char) or char in '\u200d\ufe0e\ufe0f':
+                continue
+            width += 2 if unicodedata.east_asian_width(char) in 'WF' else 1
+        # Emoji presentation selector makes a symbol like 🖐️ two cells wide
+        if width == 1 and '\ufe0f' in symbol:
+            width = 2
+        cell_widths[symbol] = width
+    return width
+
+# Class hierarchy for entities
+class Entity(ABC):
+
+    instances: list['Entity'] = []
+    """All instances of this class. This is available on each subclass."""
+    solid_instances: list['Entity'] = []
+    """All instances of this class that are solid. This is available on each subclass."""
+    class_traits: int = INTERESTING
+    """Traits that all instances of this class have, regardless of symbol."""
+    traits: int
+    """Bit flags classifying this entity, derived from its class, symbol, and solidity. Updated when the symbol changes."""
+    height = 1
+    """Number of rows this entity spans, upwards from its position."""
+    layer = CREATURE_LAYER
+    """Layer to draw this entity on. Entities on higher layers are drawn in front of those on lower layers."""
+
+    def __init__(self, x: int, y: int, symbol: str, color: Color = Color(255, 255, 255), bgcolor: Color | None = None, solid: bool = False):
+        self.x = x
+        self.y = y
+        self.solid = solid
+        self.symbol = symbol
+        self.color = color
+        self.bgcolor = bgcolor
+        self.add_to_lists()
+
+    @property
+    def symbol(self) -> str:
+        return self._symbol
+
+    @symbol.setter
+    def symbol(self, symbol: str):
+        self._symbol = symbol
+        self.symbol_width = cell_width(symbol)
+        self.traits = self.class_traits | symbol_traits.get(symbol, 0) | (SOLID if self.solid else 0)
+
+    def add_to_lists(self):
+        for cls in self.__class__.mro():
+            if issubclass(cls, Entity):
+                cls.instances.append(self)
+                if self.solid:
+                    cls.solid_instances.append(self)
+                if cls is Entity:
+                    break
+        if self.solid:
+            self.add_to_solid_cells()
+
+    def remove_from_lists(self):
+        if self.solid:
+            self.remove_from_solid_cells()
+        for cls in self.__class__.mro():
+            if issubclass(cls, Entity):
+                if self in cls.instances:
+                    cls.instances.remove(self)
+                if self in cls.solid_instances:
+                    cls.solid_instances.remove(self)
+                if cls is Entity:
+                    break
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.instances = []
+        cls.solid_instances = []
+
+    def add_to_solid_cells(self):
+        for x, y, _symbol in self.cells():
+            for i in range(self.symbol_width):
+                solid_cells.setdefault((x + i, y), []).append(self)
+
+    def remove_from_solid_cells(self):
+        for x, y, _symbol in self.cells():
+            for i in range(self.symbol_width):
+                entities = solid_cells.get((x + i, y))
+                if entities is not None and self in entities:
+                    entities.remove(self)
+
+    def cells(self) -> Iterator[tuple[int, int, str]]:
+        """Yields the position and symbol of each cell of this entity."""
+        yield self.x, self.y, self.symbol
+
+    @abstractmethod
+    def move(self):
+        pass
+
+    def collision_at(self, offset: Offset) -> bool:
+        if offset.y >= tank_height:
+            return True
+        if solid_at(offset.x, offset.y, self):
+            return True
+        if self.symbol_width > 1 and solid_at(offset.x + 1, offset.y, self):
+            return True
+        # Assuming there's no character wider than 2 cells
+        return False
+
+class Sinker(Entity):
+    def move(self):
+        if self.solid:
+            self.remove_from_solid_cells()
+        if not self.collision_at(Offset(self.x, self.y + 1)):
+            self.y += 1
+        # In case tank shrinks, move up if we're out of bounds
+        if self.y > tank_height - 1:
+            self.y = tank_height - 1
+        # If we're inside the ground, move up
+        if self.collision_at(Offset(self.x, self.y)):
+            self.y -= 1
+        if self.solid:
+            self.add_to_solid_cells()
+
+class BottomDweller(Sinker):
+    # def __init__(self, x, y, symbol, color=Color(255, 255, 255), bgcolor=None):
+    #     super().__init__(x, y, symbol, color, bgcolor)
+    def __init__(self, x, y, symbol = None):
+        if symbol is None:
+            symbol = random.choice('🦞🐌🦐🦀')
+        super().__init__(x, y, symbol)
+        self.direction = random.choice([-1, 1])
+
+    def move(self):
+        super().move()
+        # If we're on the ground, move left or right
+        if self.collision_at(Offset(self.x, self.y + 1)) and random.random() < 0.3:
+            if self.collision_at(Offset(self.x + self.direction, self.y)):
+                if not self.collision_at(Offset(self.x + self.direction, self.y - 1)):
+                    self.x += self.direction
+                    self.y -= 1
+                else:
+                    self.direction *= -1
+            else:
+                self.x += self.direction
+            # Randomly change direction occasionally
+            if random.random() < 0.05:
+                self.direction *= -1
+
+class Ink(Entity):
+    class_traits = 0
+    layer = EFFECT_LAYER
+
+    def __init__(self, x, y, color, opacity=1.0):
+        super().__init__(x, y, '▓', color)
+        self.opaque_color = color
+        self.opacity = opacity
+
+    def move(self):
+        if animating:
+            self.color = self.opaque_color.with_alpha(self.opacity)
+        self.opacity -= 0.01
+        if self.opacity <= 0:
+            self.remove_from_lists()
+        # Spread out
+        if self.opacity > 0.3:
+            for offset in [Offset(0, 1), Offset(0, -1), Offset(1, 0), Offset(-1, 0)]:
+                # Check the budget before looking for a free spot, since entity_at() scans every entity,
+                # and that scan is what the throttle needs to cut when there's a lot of ink.
+                if not spawn_budget.allows(Ink):
+                    break
+                spread_pos = Offset(self.x, self.y) + offset
+                # if entity_at(spread_pos, Ink.instances) is None:
+                if entity_at(spread_pos.x, spread_pos.y, Entity.instances) is None:
+                    Ink(spread_pos.x, spread_pos.y, self.opaque_color, self.opacity - 0.3)
+
+class Cephalopod(BottomDweller):
+    class_traits = PREDATOR | INTERESTING
+
+    def __init__(self, x, y):
+        symbol = random.choice('🦑🐙')
+        super().__init__(x, y, symbol)
+        self.ink_color = Color(0, 0, 0) if symbol == '🐙' else Color(0, 0, 100)
+        self.ink_timer = 0
+        self.hunting = None
+        self.scared = False
+
+    def move(self):
+        super().move()
+        # Look for predators
+        nearby = entities_near(self.x, self.y, 5, PREDATOR | PREY)
+        if random.random() < 0.1:
+            for entity in nearby:
+                if self.is_predator(entity):
+                    self.ink()
+                    self.scared = True
+                    # Run away
+                    self.hunting = None
+                    if entity.x < self.x:
+                        self.direction = 1
+                    elif entity.x > self.x:
+                        self.direction = -1
+                    break
+        # Look for prey
+        if random.random() < 0.1:
+            for entity in nearby:
+                if self.is_prey(entity):
+                    self.hunting = entity
+                    break
+        # Move towards prey
+        if self.hunting is not None:
+            if self.hunting.x < self.x:
+                self.direction = -1
+            elif self.hunting.x > self.x:
+                self.direction = 1
+            else:
+                self.direction = random.choice([-1, 1])
+            if self.collision_at(Offset(self.x + self.direction, self.y)):
+                self.hunting = None
+            else:
+                self.x += self.direction
+        # Eat prey
+        if self.hunting is not None and self.hunting.x == self.x and self.hunting.y == self.y:
+            self.hunting.remove_from_lists()
+            self.hunting = None
+
+    def is_predator(self, entity: Entity) -> bool:
+        return entity is not self and entity.traits & PREDATOR != 0
+
+    def is_prey(self, entity: Entity) -> bool:
+        return entity is not self and entity.traits & PREY != 0
+
+    def ink(self):
+        if spawn_budget.allows(Ink):
+            Ink(self.x, self.y, self.ink_color)
+
+class Fish(Entity):
+    """
+    Fish swim in schools, steering to match the velocity of nearby fish (alignment),
+    move towards them (cohesion), and keep from crowding them (separation).
+
+    Velocities are updated for all fish at once by school(), once per tick, before fish move.
+    """
+    neighbor_radius = 6
+    """Distance within which fish school together. Also the size of the grid cells used to find neighbors."""
+    separation_radius = 2
+    """Distance within which fish steer away from each other."""
+    max_neighbors = 7
+    """Number of neighbors each fish pays attention to, at most, so the cost stays linear in the number of fish."""
+    alignment = 0.1
+    cohesion = 0.03
+    separation = 0.15
+    max_speed = 1.0
+    max_vertical_speed = 0.3
+
+    def __init__(self, x, y):
+        super().__init__(x, y, random.choice(['🐡', '🐠', '🐠', '🐟', '🐟', '🐟']))
+        self.vx = random.choice([-1.0, 1.0])
+        self.vy = 0.0
+        # Movement accumulated in between whole cells
+        self.subcell_x = 0.0
+        self.subcell_y = 0.0
+        self.bubble_timer = 0
+
+    @classmethod
+    def school(cls):
+        """Updates the velocities of all fish based on their neighbors."""
+        # Bucket fish into a uniform grid, so neighbors can be found without comparing every pair of fish.
+        # Each entry is a snapshot of a fish's position and velocity, so that new velocities can be
+        # applied right away without the result depending on the order of the fish.
+        size = cls.neighbor_radius
+        grid: dict[tuple[int, int], list[tuple[Fish, int, int, float, float]]] = {}
+        for fish in cls.instances:
+            if not isinstance(fish, Fish):
+                continue
+            x = fish.x
+            y = fish.y
+            entry = (fish, x, y, fish.vx, fish.vy)
+            key = (x // size, y // size)
+            bucket = grid.get(key)
+            if bucket is None:
+                grid[key] = [entry]
+            else:
+                bucket.append(entry)
+
+        # Own cell first, since its fish are the most likely to be within range
+        neighborhood = [(i, j) for i in (0, -1, 1) for j in (0, -1, 1)]
+        radius_squared = cls.neighbor_radius ** 2
+        separation_radius_squared = cls.separation_radius ** 2
+        max_neighbors = cls.max_neighbors
+        alignment = cls.alignment
+        cohesion = cls.cohesion
+        separation = cls.separation
+        max_speed = cls.max_speed
+        max_vertical_speed = cls.max_vertical_speed
+        rand = random.random
+        for (cell_x, cell_y), bucket in grid.items():
+            # Gather the candidates once per grid cell, rather than once per fish
+            nearby: list[tuple[Fish, int, int, float, float]] = []
+            for i, j in neighborhood:
+                other_bucket = grid.get((cell_x + i, cell_y + j))
+                if other_bucket is not None:
+                    nearby += other_bucket
+            for fish, x, y, vx, vy in bucket:
+                count = 0
+                sum_vx = sum_vy = 0.0
+                sum_dx = sum_dy = 0
+                push_x = push_y = 0
+                for other, other_x, other_y, other_vx, other_vy in nearby:
+                    if other is fish:
+                        continue
+                    dx = other_x - x
+                    dy = other_y - y
+                    distance_squared = dx * dx + dy * dy
+                    if distance_squared >= radius_squared:
+                        continue
+                    count += 1
+                    sum_vx += other_vx
+                    sum_vy += other_vy
+                    sum_dx += dx
+                    sum_dy += dy
+                    if distance_squared < separation_radius_squared:
+                        push_x -= dx
+                        push_y -= dy
+                    if count == max_neighbors:
+                        break
+
+                if count:
+                    vx += (sum_vx / count - vx) * alignment + sum_dx / count * cohesion + push_x * separation
+                    vy += (sum_vy / count - vy) * alignment + sum_dy / count * cohesion + push_y * separation
+                elif rand() < 0.05:
+                    # Randomly change direction occasionally, when alone
+                    vx = -vx
+                # Wander a little
+                vx += rand() * 0.1 - 0.05
+                vy += rand() * 0.1 - 0.05
+                if vx > max_speed:
+                    vx = max_speed
+                elif vx < -max_speed:
+                    vx = -max_speed
+                if vy > max_vertical_speed:
+                    vy = max_vertical_speed
+                elif vy < -max_vertical_speed:
+                    vy = -max_vertical_speed
+                fish.vx = vx
+                fish.vy = vy
+
+    def stuck(self) -> bool:
+        """Returns whether the fish is outside of the tank, or overlapping something solid."""
+        x = self.x
+        y = self.y
+        if y < 0 or y >= tank_height:
+            return True
+        if solid_cells.get((x, y)):
+            return True
+        return self.symbol_width > 1 and bool(solid_cells.get((x + 1, y)))
+
+    def move(self):
+        # Move by whole cells, accumulating the remainder
+        subcell_x = self.subcell_x + self.vx
+        subcell_y = self.subcell_y + self.vy
+        step_x = int(subcell_x)
+        step_y = int(subcell_y)
+        self.subcell_x = subcell_x - step_x
+        self.subcell_y = subcell_y - step_y
+        # This is collision_at() inlined, since it runs for every fish on every tick.
+        # Fish aren't solid, so any solid entity in the way is another entity.
+        # A fish that's already somewhere it couldn't move into (such as inside the ground) may move anyway,
+        # so that it can find its way out instead of bouncing in place forever.
+        x = self.x
+        y = self.y
+        wide = self.symbol_width > 1
+        if step_x:
+            new_x = x + step_x
+            if (solid_cells.get((new_x, y)) or (wide and solid_cells.get((new_x + 1, y)))) and not self.stuck():
+                self.vx = -self.vx
+            else:
+                self.x = x = new_x
+        if step_y:
+            new_y = y + step_y
+            # Only bounce off the top and bottom of the tank when moving further out,
+            # so that fish left outside of it (e.g. by resizing the tank) can swim back in.
+            if (
+                (new_y < 0 and step_y < 0) or
+                (new_y >= tank_height and step_y > 0) or
+                ((solid_cells.get((x, new_y)) or (wide and solid_cells.get((x + 1, new_y)))) and not self.stuck())
+            ):
+                self.vy = -self.vy
+            else:
+                self.y = new_y
+
+        # Create bubbles occasionally
+        if self.bubble_timer <= 0 and random.random() < 0.1:
+            if spawn_budget.allows(Bubble):
+                Bubble(self.x, self.y - 1)
+            self.bubble_timer = 5
+        else:
+            self.bubble_timer -= 1
+
+        # Wrap around the screen
+        if self.x < 0:
+            self.x = tank_width
+        elif self.x > tank_width:
+            self.x = 0
+
+class Ground(Entity):
+    class_traits = 0
+    layer = TERRAIN_LAYER
+
+    def __init__(self, x, y):
+        symbol = random.choice('       ࿔𖡎.܈܉܇⋰∵⸪∴⸫˙\'⠁⠂⠄⠆⠈⠊⠌⠐⠑⠒⠔⠕⠘⠠⠡⠢⠪⡀⡁⡠⡡⡢⢀⢂')
+        color = random.choice([
+            Color(91, 62, 31),
+            Color(139, 69, 19),
+            Color(160, 82, 45),
+            Color(205, 133, 63),
+            Color(222, 184, 135),
+        ])
+        bgcolor = random.choice([
+            Color(102, 67, 29),
+            Color(129, 60, 10),
+            Color(127, 79, 45),
+            Color(151, 70, 33),
+            Color(175, 107, 40),
+        ])
+        super().__init__(x, y, symbol, color, bgcolor, solid=True)
+
+    def move(self):
+        self.remove_from_solid_cells()
+        if not self.collision_at(Offset(self.x, self.y + 1)):
+            self.y += 1
+        self.add_to_solid_cells()
+        # In case tank shrinks, ground will be regenerated.
+
+class SeaUrchin(Sinker):
+    class_traits = DECOR | INTERESTING
+    layer = DECOR_LAYER
+
+    def __init__(self, x, y):
+        symbol = random.choice(['✶', '✷', '✸', '✹', '✺', '*', '⚹', '✳', '꘎', '💥']) # '🗯', '🦔'
+        color = random.choice([
+            Color(255, 132, 0),
+            Color(136, 61, 194),
+            Color(255, 0, 0),
+            Color(255, 255, 255),
+        ])
+        super().__init__(x, y, symbol, color, solid=True)
+
+class Coral(Sinker):
+    class_traits = DECOR | INTERESTING
+    layer = DECOR_LAYER
+
+    def __init__(self, x, y):
+        symbol = random.choice('🪸🧠') # 🫚🫁
+        color = random.choice([
+            Color(255, 179, 0),
+            Color(255, 213, 0),
+            Color(255, 210, 254),
+            Color(255, 255, 255),
+        ])
+        super().__init__(x, y, symbol, color, solid=True)
+
+class Shell(Sinker):
+    class_traits = DECOR
+    layer = DECOR_LAYER
+
+    def __init__(self, x, y):
+        symbol = random.choice('🦪🐚𖡎') # 🥟
+        super().__init__(x, y, symbol, solid=True)
+
+class Rock(Sinker):
+    class_traits = DECOR
+    layer = DECOR_LAYER
+
+    def __init__(self, x, y):
+        # rock emoji width is unreliable (it takes up one space in VS Code, but two in Ubuntu Terminal)
+        # symbol = random.choice('🪨🪨🪨🪨🗿')
+        symbol = random.choice('⬬⬟⭓⬢⬣☗☁⬤🗿')
+        super().__init__(x, y, symbol, Color(128, 128, 128), solid=True)
+
+class Seaweed(Sinker):
+    """
+    A stalk of seaweed, made up of segments stacked on top of each other.
+
+    The entity's position is that of the bottom segment, which has gravity.
+    The segments above it are stored as horizontal offsets from the bottom segment,
+    rather than as separate entities, so the whole stalk can be updated in one pass.
+    """
+    class_traits = DECOR
+    layer = DECOR_LAYER
+    max_height = 12
+    """Number of segments that seaweed can grow to."""
+    growth_rate = 0.01
+    """Chance per tick of growing a segment."""
+
+    def __init__(self, x, y):
+        super().__init__(x, y, '🌿')
+        self.segment_offsets: list[int] = [0]
+        """Horizontal offset of each segment relative to the bottom segment, from the bottom up."""
+
+    @property
+    def height(self) -> int:
+        return len(self.segment_offsets)
+
+    def cells(self) -> Iterator[tuple[int, int, str]]:
+        for i, offset in enumerate(self.segment_offsets):
+            yield self.x + offset, self.y - i, self.symbol
+
+    def move(self):
+        # Apply gravity to the bottom segment, which the rest follow
+        super().move()
+
+        # Wiggle back and forth, within 1 space of the segments below and above
+        offsets = self.segment_offsets
+        top = len(offsets) - 1
+        wiggles = random.choices((-1, 0, 1), k=top)
+        for i in range(1, top + 1):
+            old_offset = offsets[i]
+            new_offset = old_offset + wiggles[i - 1]
+            # Constrain to the range of the segment above
+            if i < top:
+                new_offset = max(new_offset, offsets[i + 1] - 1)
+                new_offset = min(new_offset, offsets[i + 1] + 1)
+            # Constrain to the range of the segment below
+            # Do this after so it takes precedence, since the bottom segment has gravity.
+            new_offset = max(new_offset, offsets[i - 1] - 1)
+            new_offset = min(new_offset, offsets[i - 1] + 1)
+            # Constrain so it doesn't move too much at once
+            new_offset = max(new_offset, old_offset - 1)
+            new_offset = min(new_offset, old_offset + 1)
+            offsets[i] = new_offset
+
+        # Grow a new segment on top if there is room
+        if len(offsets) < self.max_height and self.y - len(offsets) >= 0 and random.random() < self.growth_rate:
+            offsets.append(offsets[-1])
+
+class Bubble(Entity):
+    class_traits = 0
+    layer = EFFECT_LAYER
+
+    def __init__(self, x, y):
+        # 🫧 width is unreliable (looks wrong in Ubuntu terminal)
+        symbol = random.choice(['･', '◦', '∘', 'ߋ', '𝚘', 'ᴑ', 'o', 'O', 'ₒ', '°', '˚', 'ᴼ', ':', 'ஃ', '🝆', 'ꖜ', 'ꕣ', 'ꕢ']) # , *['🫧'] * 10
+        super().__init__(x, y, symbol, Color(157, 229, 255))
+
+    def move(self):
+        self.y -= 1
+
+        # Move sideways occasionally
+        if random.random() < 0.1:
+            self.x += random.choice([-1, 1])
+
+        # Remove the bubble if it reaches the top of the tank
+        if self.y < 0:
+            self.remove_from_lists()
+
+class HumanBodyPart(Entity):
+    class_traits = 0
+
+    def __init__(self, x: int, y: int, symbol: str, human: 'Human'):
+        super().__init__(x, y, symbol, Color(255, 255, 0), solid=False)
+        self.human = human
+    def move(self):
+        pass
+class HumanHead(HumanBodyPart):
+    pass
+class HumanTorso(HumanBodyPart):
+    pass
+class HumanLeftArm(HumanBodyPart):
+    pass
+class HumanRightArm(HumanBodyPart):
+    pass
+class HumanLeftLeg(HumanBodyPart):
+    pass
+class HumanRightLeg(HumanBodyPart):
+    pass
+
+class Human(Entity):
+    """
+    Human divers use several symbols in a template, with entities for each body part.
+
+    Some of these examples vary from the template, and include extra parts for gear or legs.
+      🤿
+    🫷🧥🫸
+      👖
+     🩴🩴
+
+     ➿🏒
+    /👙\
+     /\
+
+      |
+    🧯🥽
+    💪🩱🫳
+    🦵 🦶
+
+       |
+      ꝏ    ∞ ಹ  ⛽🛢️
+    👋🎽🖖
+      🩳
+      🧦
+    """
+    class_traits = 0
+
+    def __init__(self, x: int, y: int):
+        super().__init__(x, y, '', Color(255, 255, 0))
+        self.direction = random.choice([-1, 0, 1])
+        self.vertical_direction = random.choice([-1, 0, 1])
+        self.vertical_move_timer = 0
+        self.bubble_timer = 0
+        self.attention: Entity | None = None
+        self.seen: set[Entity] = set()
+        TEMPLATE: list[list[type[HumanBodyPart] | None]] = [
+            [None, None, HumanHead, None, None],
+            [HumanLeftArm, None, HumanTorso, None, HumanRightArm],
+            [None, HumanLeftLeg, None, HumanRightLeg, None],
+        ]
+        self.parts: dict[Offset, HumanBodyPart] = {}
+        for row in range(len(TEMPLATE)):
+            for col in range(len(TEMPLATE[row])):
+                cls = TEMPLATE[row][col]
+                if cls is not None:
+                    if cls is HumanHead:
+                        part_symbol = random.choice('🤿🥽➿ꝏ∞ಹ😎')
+                    elif cls is HumanTorso:
+                        part_symbol = random.choice('🧥🩱👙🎽')
+                    elif cls is HumanLeftArm:
+                        part_symbol = random.choice('🫷💪🖖👋')
+                    elif cls is HumanRightArm:
+                        part_symbol = random.choice('🫸🫳🖖👋')
+                    # elif cls is HumanLeftLeg or cls is HumanRightLeg:
+                    #     part_symbol = "🩴"
+                    elif cls is HumanLeftLeg:
+                        part_symbol = random.choice('🦵')
+                    elif cls is HumanRightLeg:
+                        part_symbol = random.choice('🦶')
+                    else:
+                        raise Exception(f"Unknown class for human body part: {cls}")
+
+                    offset = Offset(col - 2, row)
+                    part = cls(self.x + offset.x, self.y + offset.y, part_symbol, self)
+                    self.parts[offset] = part
+
+    def collision_at(self, human_offset: Offset) -> bool:
+        for part_offset, part in self.parts.items():
+            if part.collision_at(human_offset + part_offset):
+                return True
+        return False
+
+    def move(self):
+        if self.collision_at(Offset(self.x + self.direction, self.y)):
+            self.direction *= -1
+        else:
+            self.x += self.direction
+        if self.vertical_direction != 0:
+            self.vertical_move_timer -= 1
+            if self.vertical_move_timer <= 0:
+                self.vertical_move_timer = 10
+                if self.collision_at(Offset(self.x, self.y + self.vertical_direction)):
+                    self.vertical_direction = 0
+                else:
+                    self.y += self.vertical_direction
+
+        # Randomly change direction occasionally
+        if random.random() < 0.05:
+            self.direction = random.choice([-1, 0, 1])
+        if random.random() < 0.05:
+            self.vertical_direction = random.choice([-1, 0, 1])
+
+        # Create bubbles regularly, in bursts
+        if self.bubble_timer <= 6 and spawn_budget.allows(Bubble):
+            Bubble(self.x, self.y - 1)
+        if self.bubble_timer <= 0:
+            self.bubble_timer = 20
+        else:
+            self.bubble_timer -= 1
+
+        # Wrap around the screen
+        if self.x < 0:
+            self.x = tank_width - 1
+        elif self.x > tank_width - 1:
+            self.x = 0
+
+        # Look around
+        if random.random() < 0.05:
+            self.attention = None
+            nearby = entities_near(self.x, self.y, 5, INTERESTING)
+            for entity in nearby:
+                if entity not in self.seen and self.finds_interesting(entity):
+                    self.seen.add(entity)
+                    self.attention = entity
+                    self.direction = 0
+                    self.vertical_direction = 0
+                    # Debug: visualize attention (persisting after attention is lost)
+                    # entity.bgcolor = Color(255, 0, 0)
+                    break
+
+        # Position body parts
+        self.position_subparts()
+
+        # Get outside ground if spawned inside it or moved into it
+        if self.collision_at(Offset(self.x, self.y)):
+            self.y -= 1
+
+    def finds_interesting(self, entity: Entity) -> bool:
+        # Humans, their body parts, bubbles, ink, shells, rocks, seaweed and ground
+        # lack the INTERESTING trait. (Coral could be excluded too.)
+        return entity is not self and entity.traits & INTERESTING != 0
+
+    def position_subparts(self):
+        for offset, part in self.parts.items():
+            part.x = self.x + offset.x
+            part.y = self.y + offset.y
+            if not animating:
+                continue
+            if isinstance(part, HumanLeftLeg) or isinstance(part, HumanRightLeg):
+                # Move legs to animate swimming
+                if time.time() % 0.5 < 0.25:
+                    part.x += 1 if offset.x > 0 else -1
+            # Animate arms
+            if isinstance(part, HumanLeftArm) or isinstance(part, HumanRightArm):
+                if time.time() % 0.5 < 0.25 and self.vertical_direction != 0:
+                    part.y -= 1
+            phase = 0.1 if self.vertical_direction == 1 else 0.4
+            if isinstance(part, HumanLeftArm) and (self.direction == 1 or self.vertical_direction != 0):
+                part.symbol = "🫷" if (time.time() + phase) % 0.5 < 0.25 else "👋" # 🖐️💪
+            if isinstance(part, HumanRightArm) and (self.direction == -1 or self.vertical_direction != 0):
+                part.symbol = "🫸" if (time.time() + phase) % 0.5 < 0.25 else "🫳" # 🫱
+            # Point at object with attention
+            if isinstance(part, HumanLeftArm) or isinstance(part, HumanRightArm):
+                if self.attention is not None and self.vertical_direction == 0 and self.direction == 0:
+                    part.symbol = "👈" if self.attention.x < part.x - 1 else "👉" if self.attention.x > part.x + 1 else "👇" if self.attention.y >= part.x else "👆"
+                elif part.symbol in "👈👉👇👆":
+                    part.symbol = "🖐️" # don't keep pointing after moving on
+
+class GardenEel(BottomDweller):
+    def __init__(self, x: int, y: int):
+        super().__init__(x, y, 'S') # 🪱𓆙〰️〰𓆓〽𓆑
+
+    def move(self):
+        # If we're on the ground (and not just any solid entity),
+        # "burrow" into it (by staying put and changing symbol)
+        if entity_at(self.x, self.y + 1, Ground.instances):
+            if animating and random.random() < 0.1:
+                self.symbol = random.choice('()⎛⎞/\\|,')
+        else:
+            self.symbol = 'S'
+            super().move()
+
+class SpawnBudget:
+    """
+    Limits spawning of entities, so that the cost of a frame stays bounded
+    no matter how many bubbles, ink, etc. the tank (or the user) tries to create.
+
+    Entities created while setting up the tank are not subject to the budget,
+    only those spawned during the simulation.
+
+    The throttle only adapts to frame times reported with record_frame_time(),
+    which the caller of step() is responsible for, since it knows what else a frame costs (such as rendering).
+    """
+    def __init__(self, max_entities: int, caps: dict[type[Entity], int], frame_time_budget: float):
+        self.max_entities = max_entities
+        """Spawning stops when there are this many entities in total."""
+        self.caps = caps
+        """Per-class limits on the number of instances, for classes that spawn a lot."""
+        self.frame_time_budget = frame_time_budget
+        """Target maximum duration of a frame, in seconds, including both the tick and rendering it."""
+        self.throttle = 1.0
+        """Fraction of the per-class caps currently available. Reduced while frames are taking too long."""
+
+    def allows(self, cls: type[Entity]) -> bool:
+        """Returns whether a new instance of the given class may be spawned."""
+        if len(Entity.instances) >= self.max_entities:
+            return False
+        cap = self.caps.get(cls)
+        if cap is not None and len(cls.instances) >= cap * self.throttle:
+            return False
+        return True
+
+    def record_frame_time(self, seconds: float):
+        """Adjusts the throttle based on how long the last frame took, from the start of its tick to the end of rendering."""
+        # Back off quickly when over budget, and recover slowly, so it doesn't oscillate too much.
+        if seconds > self.frame_time_budget:
+            self.throttle = max(0.1, self.throttle * 0.5)
+        else:
+            self.throttle = min(1.0, self.throttle + 0.05)
+
+spawn_budget = SpawnBudget(
+    max_entities=5000,
+    caps={
+        Bubble: 300,
+        Ink: 500,
+    },
+    frame_time_budget=0.05,
+)
+
+def solid_at(x: int, y: int, exclude: Entity | None = None) -> bool:
+    """Returns whether a solid entity (other than `exclude`) occupies the given cell."""
+    for entity in solid_cells.get((x, y), ()):
+        if entity is not exclude:
+            return True
+    return False
+
+def index_solid_cells():
+    """Rebuilds solid_cells, to account for entities moved by other means than their own move()."""
+    solid_cells.clear()
+    for entity in Entity.solid_instances:
+        entity.add_to_solid_cells()
+
+def entities_near(x: int, y: int, radius: float, traits: int) -> list[Entity]:
+    """Returns entities with any of the given traits within the radius of a position, nearest first."""
+    nearby: list[tuple[int, Entity]] = []
+    radius_squared = radius * radius
+    for entity in Entity.instances:
+        if entity.traits & traits:
+            distance_squared = (entity.x - x) ** 2 + (entity.y - y) ** 2
+            if distance_squared < radius_squared:
+                nearby.append((distance_squared, entity))
+    nearby.sort(key=lambda pair: pair[0])
+    return [entity for _, entity in nearby]
+
+def entity_at(x: int, y: int, entities: list[Entity]) -> Entity | None:
+    for entity in entities:
+        if entity.x <= x < entity.x + entity.symbol_width and entity.y == y:
+            return entity
+        if entity.height > 1 and entity.y - entity.height < y < entity.y:
+            for cell_x, cell_y, _symbol in entity.cells():
+                if cell_x <= x < cell_x + entity.symbol_width and cell_y == y:
+                    return entity
+    return None
+
+def random_pos():
+    return random.randint(0, tank_width), random.randint(0, tank_height)
+
+def ground_height(x: int) -> int:
+    return 4 + int(2 * math.sin(x / 10) + 1 * math.sin(x / 5) + 1 * math.sin(x / 2))
+
+def generate_ground():
+    for ground in list(Ground.instances):
+        ground.remove_from_lists()
+    for x in range(tank_width):
+        for y in range(tank_height-ground_height(x), tank_height):
+            Ground(x, y)
+
+def populate_tank():
+    """Creates the initial entities of the tank, including the ground."""
+    for _ in range(5):
+        Fish(*random_pos())
+    for _ in range(5):
+        SeaUrchin(*random_pos())
+    for _ in range(2):
+        BottomDweller(*random_pos())
+    for _ in range(2):
+        Cephalopod(*random_pos())
+    for _ in range(5):
+        Coral(*random_pos())
+    for _ in range(5):
+        Shell(*random_pos())
+    for _ in range(5):
+        Rock(*random_pos())
+    for _ in range(10):
+        Seaweed(*random_pos())
+    for _ in range(2):
+        Human(*random_pos())
+
+    generate_ground()
+
+    garden_eel_colony_x = random.randint(0, tank_width)
+    for _ in range(5):
+        eel_x = garden_eel_colony_x + random.randint(-8, 8)
+        GardenEel(eel_x, tank_height - ground_height(eel_x) - 1)
+
+def resize_tank(width: int, height: int):
+    """Changes the size of the tank, keeping things anchored relative to the bottom of the tank."""
+    global tank_width, tank_height
+
+    # Move everything up/down to keep things anchored relative to the bottom of the tank.
+    # Do this before re-generating the ground, so that the new ground doesn't get offset.
+    for entity in Entity.instances:
+        entity.y += height - tank_height
+
+    tank_width = width
+    tank_height = height
+
+    generate_ground()
+    # Entities were moved directly, so the collision index needs rebuilding,
+    # in case ticks are run before the next step() would rebuild it (e.g. while fast-forwarding).
+    index_solid_cells()
+
+def step(skip: Collection[Entity] = (), animate: bool = True):
+    """
+    Advances the simulation by one tick. Entities in `skip` (such as one being dragged) are not moved.
+
+    Pass `animate=False` to skip work that only matters for display, when running ticks without rendering them.
+    """
+    global animating
+    animating = animate
+    index_solid_cells()
+    Fish.school()
+    for entity in Entity.instances:
+        if entity not in skip:
+            entity.move()